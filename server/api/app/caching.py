@@ -0,0 +1,138 @@
+import hashlib
+import time
+
+from .config import settings
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header value against a strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class BodyCache:
+    """In-process cache for a single serialized response body.
+
+    Entries expire after `ttl` seconds so other workers' writes become
+    visible; `invalidate()` drops the entry immediately for this worker.
+    A body computed while an invalidation happened is not stored.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.generation = 0
+        self._entry: tuple[str, bytes, float] | None = None  # (etag, body, cached_at)
+
+    def get(self) -> tuple[str, bytes] | None:
+        entry = self._entry
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            return None
+        return entry[0], entry[1]
+
+    def set(self, body: bytes, generation: int) -> str:
+        """Store `body` if no invalidation happened since `generation`; return its ETag."""
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if generation == self.generation:
+            self._entry = (etag, body, time.monotonic())
+        return etag
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self._entry = None
+
+
+class TTLSet:
+    """In-process set whose members expire `ttl` seconds after being added.
+
+    When `maxsize` is reached the oldest member is evicted. Like BodyCache,
+    entries are per worker, so a removal elsewhere is seen after `ttl`.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._expires: dict = {}
+
+    def __contains__(self, item) -> bool:
+        expires = self._expires.get(item)
+        if expires is None:
+            return False
+        if time.monotonic() > expires:
+            del self._expires[item]
+            return False
+        return True
+
+    def add(self, item) -> None:
+        self._expires.pop(item, None)
+        if len(self._expires) >= self.maxsize:
+            del self._expires[next(iter(self._expires))]
+        self._expires[item] = time.monotonic() + self.ttl
+
+    def discard(self, item) -> None:
+        self._expires.pop(item, None)
+
+
+class KeyedBodyCache:
+    """BodyCache for many keys (e.g. one body per node), bounded to `maxsize`.
+
+    The generation counter is shared by all keys, so invalidating any key
+    also discards bodies for other keys computed meanwhile; that only
+    costs a cache miss.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = 0
+        self._entries: dict = {}  # key -> (etag, body, cached_at)
+
+    def get(self, key) -> tuple[str, bytes] | None:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            return None
+        return entry[0], entry[1]
+
+    def set(self, key, body: bytes, generation: int) -> str:
+        """Store `body` if no invalidation happened since `generation`; return its ETag."""
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if generation == self.generation:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.maxsize:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (etag, body, time.monotonic())
+        return etag
+
+    def invalidate(self, key) -> None:
+        self.generation += 1
+        self._entries.pop(key, None)
+
+
+# Shared per-worker caches. Entries expire after their TTL so other
+# workers' writes become visible; the helpers below drop them at once.
+
+# Serialized /ota/updates/pending body; the pending set only changes when an
+# update is created or moves out of pending, so gateway polls rarely
+# need to touch the database
+pending_cache = BodyCache(ttl=settings.pending_cache_ttl_seconds)
+# Nodes recently seen in the database, so existence checks can skip a query
+known_nodes = TTLSet(ttl=settings.node_cache_ttl_seconds, maxsize=settings.node_cache_size)
+# get_node_state response bodies, keyed by node ID
+node_state_cache = KeyedBodyCache(ttl=settings.state_cache_ttl_seconds, maxsize=settings.node_cache_size)
+
+
+def invalidate_pending_cache() -> None:
+    """Drop the cached pending-update list after a status change."""
+    pending_cache.invalidate()
+
+
+def invalidate_node_state(node_id: int) -> None:
+    """Drop a node's cached state after a push changed it."""
+    node_state_cache.invalidate(node_id)
+
+
+def forget_node(node_id: int) -> None:
+    """Drop everything cached about a deleted node."""
+    known_nodes.discard(node_id)
+    node_state_cache.invalidate(node_id)
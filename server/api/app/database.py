@@ -3,8 +3,34 @@ from sqlalchemy.orm import declarative_base
 
 from .config import settings
 
-engine = create_async_engine(settings.database_url, echo=False)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+engine = create_async_engine(
+    settings.database_url,
+    echo=False,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_pre_ping=False,
+    # Sessions end their own transactions before releasing a connection, and
+    # no handler leaves session state (SET, LISTEN, temp tables) behind, so
+    # skip the reset rollback on return to the pool
+    pool_reset_on_return=None,
+    # Compiled SQL cache shared by all sessions (LRU, bounded)
+    query_cache_size=settings.db_query_cache_size,
+    connect_args={
+        # Per-connection LRU of asyncpg prepared statements
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        "command_timeout": settings.db_command_timeout_seconds,
+        "server_settings": {
+            # JIT only adds planning overhead for small OLTP queries
+            "jit": "off",
+            "application_name": settings.db_application_name,
+        },
+    },
+)
+# Handlers flush explicitly where they need generated values (create_update),
+# so queries don't pay for an autoflush check of the session first
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
 
 Base = declarative_base()
 
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .config import settings
+from .database import engine
+from .models import Telemetry, StateHistory
+
+logger = logging.getLogger(__name__)
+
+
+class CopyBuffer:
+    """Buffers rows for one hypertable and writes them in batches with COPY.
+
+    Rows are queued by `offer()` and flushed by a background task using
+    asyncpg's binary `copy_records_to_table`. If a COPY fails (e.g. a
+    duplicate key), the batch is retried as an INSERT ... ON CONFLICT DO
+    NOTHING. `offer()` returns False when the buffer isn't running or is
+    full, and the caller should then insert the row itself.
+    """
+
+    def __init__(self, model, batch_size: int, flush_seconds: float, maxsize: int):
+        self.table = model.__table__
+        self.columns = [c.name for c in self.table.columns]
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize)
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self._writing: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def offer(self, row: dict) -> bool:
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out anything still buffered."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._writing is not None:
+            # A batch being written when the task was cancelled is finished,
+            # not written again
+            await self._writing
+        await self._flush()
+
+    async def _run(self) -> None:
+        while True:
+            self._pending.append(await self._queue.get())
+            if self._queue.qsize() < self.batch_size:
+                # Give a batch time to accumulate
+                await asyncio.sleep(self.flush_seconds)
+            await self._flush()
+
+    async def _flush(self) -> None:
+        while self._pending or not self._queue.empty():
+            while len(self._pending) < self.batch_size and not self._queue.empty():
+                self._pending.append(self._queue.get_nowait())
+            batch, self._pending = self._pending, []
+            # Shielded so cancelling the flush task can't abort a COPY midway
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    async def _write(self, rows: list[dict]) -> None:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    self.table.name,
+                    records=[tuple(row[c] for c in self.columns) for row in rows],
+                    columns=self.columns,
+                )
+            return
+        except Exception as e:
+            logger.warning("COPY into %s failed, falling back to INSERT: %s", self.table.name, e)
+
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(pg_insert(self.table).on_conflict_do_nothing(), rows)
+        except Exception:
+            logger.exception("Dropped %d %s rows", len(rows), self.table.name)
+
+
+# Started from the app lifespan when settings.ingest_copy_enabled is set
+telemetry_buffer = CopyBuffer(
+    Telemetry, settings.ingest_batch_size, settings.ingest_flush_seconds, settings.ingest_queue_size
+)
+state_history_buffer = CopyBuffer(
+    StateHistory, settings.ingest_batch_size, settings.ingest_flush_seconds, settings.ingest_queue_size
+)
@@ -1,43 +1,62 @@
 import asyncio
 from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select, update
+from sqlalchemy import func, update
 
 from .config import settings
 from .database import async_session
+from .ingest import telemetry_buffer, state_history_buffer
 from .models import Node
+from .responses import ORJSONResponse
 from .routers import nodes_router, telemetry_router, state_router, firmware_router, ota_router
 
 
 # Background task for offline detection
 async def check_offline_nodes():
-    """Mark nodes as offline if no telemetry received recently."""
+    """Mark nodes as offline if no telemetry received recently.
+
+    Backs off while nothing changes, so an idle mesh isn't hit with an
+    UPDATE every cycle; any node going offline resets the interval.
+    """
+    interval = settings.offline_check_min_seconds
     while True:
-        await asyncio.sleep(30)  # Check every 30 seconds
+        await asyncio.sleep(interval)
         try:
             async with async_session() as db:
-                threshold = datetime.utcnow() - timedelta(seconds=settings.offline_threshold_seconds)
-                await db.execute(
+                threshold = func.now() - timedelta(seconds=settings.offline_threshold_seconds)
+                result = await db.execute(
                     update(Node)
                     .where(Node.last_seen < threshold, Node.is_online == True)
                     .values(is_online=False)
                 )
                 await db.commit()
+
+            if result.rowcount:
+                interval = settings.offline_check_min_seconds
+            else:
+                interval = min(
+                    interval * settings.offline_check_backoff,
+                    settings.offline_check_max_seconds,
+                )
         except Exception as e:
             print(f"[OFFLINE CHECK] Error: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: start background task
+    # Startup: start background tasks
     task = asyncio.create_task(check_offline_nodes())
+    if settings.ingest_copy_enabled:
+        telemetry_buffer.start()
+        state_history_buffer.start()
     yield
-    # Shutdown: cancel background task
+    # Shutdown: flush buffered rows, then cancel background task
+    await telemetry_buffer.stop()
+    await state_history_buffer.stop()
     task.cancel()
     try:
         await task
@@ -50,11 +69,12 @@ app = FastAPI(
     description="Telemetry collection and management API for IoTMesh nodes",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Templates for test UI
+# Test UI page is static HTML; load it once instead of rendering per request
 templates_dir = Path(__file__).parent / "templates"
-templates = Jinja2Templates(directory=str(templates_dir))
+test_html = (templates_dir / "test.html").read_bytes()
 
 # Include routers
 app.include_router(nodes_router)
@@ -67,13 +87,13 @@ app.include_router(ota_router)
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 
 @app.get("/test", response_class=HTMLResponse)
-async def test_ui(request: Request):
+async def test_ui():
     """Serve the test UI page."""
-    return templates.TemplateResponse("test.html", {"request": request})
+    return HTMLResponse(content=test_html)
 
 
 @app.get("/")
@@ -1,6 +1,6 @@
 from .node import Node
-from .telemetry import Telemetry, CurrentState, StateHistory
+from .telemetry import Telemetry, CurrentState, StateHistory, telemetry_1m
 from .firmware import Firmware
 from .ota import OTAUpdate, OTANodeStatus
 
-__all__ = ["Node", "Telemetry", "CurrentState", "StateHistory", "Firmware", "OTAUpdate", "OTANodeStatus"]
+__all__ = ["Node", "Telemetry", "CurrentState", "StateHistory", "telemetry_1m", "Firmware", "OTAUpdate", "OTANodeStatus"]
@@ -1,12 +1,18 @@
 from datetime import datetime
-from sqlalchemy import String, Boolean, Integer, Text, LargeBinary, DateTime
+from sqlalchemy import String, Boolean, Integer, Text, DateTime, Computed, Index, UniqueConstraint, text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..database import Base
 
+OTA_PART_SIZE = 1024  # Bytes per chunk for painlessMesh OTA
+
 
 class Firmware(Base):
     __tablename__ = "firmware"
+    __table_args__ = (
+        UniqueConstraint("node_type", "version", "hardware"),
+        Index("idx_firmware_type_version", "node_type", text("version DESC")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     node_type: Mapped[str] = mapped_column(String(30), nullable=False)
@@ -15,7 +21,12 @@ class Firmware(Base):
     filename: Mapped[str] = mapped_column(String(100), nullable=False)
     size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
     md5_hash: Mapped[str] = mapped_column(String(32), nullable=False)
-    binary_data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # ceil(size_bytes / OTA_PART_SIZE), stored once at upload
+    num_parts: Mapped[int] = mapped_column(
+        Integer,
+        Computed(f"(size_bytes + {OTA_PART_SIZE - 1}) / {OTA_PART_SIZE}", persisted=True),
+    )
+    storage_path: Mapped[str] = mapped_column(String(255), nullable=False)
     release_notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     is_stable: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Boolean, DateTime
+from sqlalchemy import String, Boolean, BigInteger, DateTime, Index, text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..database import Base
@@ -7,14 +7,20 @@ from ..database import Base
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        # list_nodes ordering
+        Index("idx_nodes_last_seen", text("last_seen DESC")),
+        # Offline sweep only touches nodes still marked online
+        Index("idx_nodes_online_last_seen", "last_seen", postgresql_where=text("is_online")),
+    )
 
-    id: Mapped[str] = mapped_column(String(10), primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)  # Mesh node ID
     name: Mapped[str | None] = mapped_column(String(50), nullable=True)
     firmware_version: Mapped[str | None] = mapped_column(String(20), nullable=True)
     ip_address: Mapped[str | None] = mapped_column(String(45), nullable=True)
-    first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     is_online: Mapped[bool] = mapped_column(Boolean, default=True)
     role: Mapped[str] = mapped_column(String(10), default="NODE")
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
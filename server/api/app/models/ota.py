@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Boolean, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import String, Boolean, Integer, BigInteger, Text, DateTime, ForeignKey, Index, UniqueConstraint, text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
@@ -7,14 +7,19 @@ from ..database import Base
 
 class OTAUpdate(Base):
     __tablename__ = "ota_updates"
+    __table_args__ = (
+        Index("idx_ota_updates_status", "status", "created_at"),
+        # Gateway poll only ever scans the small pending set
+        Index("idx_ota_updates_pending", "created_at", postgresql_where=text("status = 'pending'")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     firmware_id: Mapped[int] = mapped_column(Integer, ForeignKey("firmware.id", ondelete="CASCADE"))
-    target_node_id: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    target_node_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     target_node_type: Mapped[str | None] = mapped_column(String(30), nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="pending")
     force_update: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
@@ -25,10 +30,13 @@ class OTAUpdate(Base):
 
 class OTANodeStatus(Base):
     __tablename__ = "ota_node_status"
+    __table_args__ = (
+        UniqueConstraint("update_id", "node_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     update_id: Mapped[int] = mapped_column(Integer, ForeignKey("ota_updates.id", ondelete="CASCADE"))
-    node_id: Mapped[str] = mapped_column(String(10), nullable=False)
+    node_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     status: Mapped[str] = mapped_column(String(20), default="pending")
     current_part: Mapped[int] = mapped_column(Integer, default=0)
     total_parts: Mapped[int | None] = mapped_column(Integer, nullable=True)
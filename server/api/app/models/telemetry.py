@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Text
+from sqlalchemy import String, Integer, BigInteger, DateTime, Text, Index, column, table, text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..database import Base
@@ -7,30 +7,55 @@ from ..database import Base
 
 class Telemetry(Base):
     __tablename__ = "telemetry"
+    __table_args__ = (
+        # Latest-row-per-node lookups (list_nodes) and index-only history scans
+        Index(
+            "idx_telemetry_node_time",
+            "node_id",
+            text("time DESC"),
+            postgresql_include=["heap_free", "uptime_sec", "peer_count", "role"],
+        ),
+    )
 
     time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
-    node_id: Mapped[str] = mapped_column(String(10), primary_key=True)
+    node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
     heap_free: Mapped[int | None] = mapped_column(Integer, nullable=True)
     uptime_sec: Mapped[int | None] = mapped_column(Integer, nullable=True)
     peer_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     role: Mapped[str | None] = mapped_column(String(10), nullable=True)
 
 
+# Continuous aggregate over telemetry in 1-minute buckets (see init.sql).
+# A lightweight table so it stays out of Base.metadata.
+telemetry_1m = table(
+    "telemetry_1m",
+    column("bucket", DateTime(timezone=True)),
+    column("node_id", BigInteger),
+    column("heap_free", Integer),
+    column("uptime_sec", Integer),
+    column("peer_count", Integer),
+    column("role", String(10)),
+)
+
+
 class CurrentState(Base):
     __tablename__ = "current_state"
 
-    node_id: Mapped[str] = mapped_column(String(10), primary_key=True)
+    node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
     key: Mapped[str] = mapped_column(String(50), primary_key=True)
     value: Mapped[str | None] = mapped_column(Text, nullable=True)
     version: Mapped[int] = mapped_column(Integer, default=1)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 class StateHistory(Base):
     __tablename__ = "state_history"
+    __table_args__ = (
+        Index("idx_state_history_node_key", "node_id", "key", text("time DESC")),
+    )
 
     time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
-    node_id: Mapped[str] = mapped_column(String(10), primary_key=True)
+    node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
     key: Mapped[str] = mapped_column(String(50), primary_key=True)
     value: Mapped[str | None] = mapped_column(Text, nullable=True)
     version: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -0,0 +1,42 @@
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+from .database import async_session
+
+STREAM_CHUNK_ROWS = 1000  # Rows fetched and serialized per streamed chunk
+
+# UTC datetimes end in "Z" rather than "+00:00", matching Pydantic's JSON
+# output so a resource looks the same whichever path serialized it
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(content) -> bytes:
+    """Serialize `content` to JSON with the API's orjson options."""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+# List endpoints select rows already shaped like their response model and
+# return them through ORJSONResponse or iter_json_rows. Returning a
+# Response skips FastAPI's per-row response-model validation; the route's
+# response_model still documents the shape.
+class ORJSONResponse(_ORJSONResponse):
+    """ORJSONResponse that serializes with ORJSON_OPTIONS."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+async def iter_json_rows(stmt, params: dict | None = None):
+    """Yield a statement's rows as a JSON array, fetched and encoded in chunks.
+
+    Uses its own session: the request's session is closed before a
+    streamed body is sent.
+    """
+    async with async_session() as db:
+        result = await db.stream(stmt, params)
+        yield b"["
+        separator = b""
+        async for rows in result.mappings().partitions(STREAM_CHUNK_ROWS):
+            yield separator + dumps([dict(row) for row in rows])[1:-1]
+            separator = b","
+        yield b"]"
@@ -1,15 +1,98 @@
+import asyncio
 import hashlib
+import os
+import uuid
+from pathlib import Path
+
+import aiofiles
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header
-from fastapi.responses import Response
-from sqlalchemy import select, func
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import bindparam, select, func, delete, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..caching import etag_matches, invalidate_pending_cache
+from ..config import settings
 from ..database import get_db
 from ..models import Firmware
+from ..responses import ORJSONResponse
 from ..schemas import FirmwareOut, FirmwareList
 
 router = APIRouter(prefix="/api/v1/firmware", tags=["firmware"])
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes copied/hashed per iteration when storing uploads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes per chunk for ranged downloads
+# Firmware bytes never change for a given ID, so clients may cache forever
+DOWNLOAD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Metadata columns for FirmwareOut; selecting these instead of the whole
+# entity keeps storage details out of listing queries
+FIRMWARE_OUT_COLUMNS = (
+    Firmware.id,
+    Firmware.node_type,
+    Firmware.version,
+    Firmware.hardware,
+    Firmware.filename,
+    Firmware.size_bytes,
+    Firmware.md5_hash,
+    Firmware.release_notes,
+    Firmware.is_stable,
+    Firmware.created_at,
+)
+
+# Per-ID lookups, built once at import and executed with {"id": ...}
+GET_FIRMWARE_STMT = select(*FIRMWARE_OUT_COLUMNS).where(Firmware.id == bindparam("id"))
+DOWNLOAD_FIRMWARE_STMT = select(
+    Firmware.filename,
+    Firmware.size_bytes,
+    Firmware.md5_hash,
+    Firmware.storage_path,
+).where(Firmware.id == bindparam("id"))
+
+
+def store_blob(src, storage_dir: Path) -> tuple[str, int, Path]:
+    """Copy an upload into the blob store, hashing in the same pass.
+
+    Runs in a worker thread; hashlib and file I/O release the GIL on
+    large buffers. MD5 is kept because painlessMesh verifies OTA images
+    against it. Each upload gets its own blob, named <md5>-<upload id>.bin,
+    so deleting one firmware row never removes a file another row uses.
+    Returns (md5_hash, size_bytes, path).
+    """
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    tmp_path = storage_dir / f".upload-{upload_id}.tmp"
+
+    hasher = hashlib.md5()
+    size_bytes = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                out.write(chunk)
+                size_bytes += len(chunk)
+
+        md5_hash = hasher.hexdigest()
+        path = storage_dir / f"{md5_hash}-{upload_id}.bin"
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return md5_hash, size_bytes, path
+
+
+async def iter_file_range(path: str, start: int, length: int):
+    """Yield `length` bytes of a file starting at `start`, in chunks."""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
 
 @router.post("/upload", response_model=FirmwareOut)
 async def upload_firmware(
@@ -22,26 +105,27 @@ async def upload_firmware(
     db: AsyncSession = Depends(get_db),
 ):
     """Upload a firmware binary file."""
-    # Read the binary data
-    binary_data = await file.read()
-    size_bytes = len(binary_data)
-
-    # Calculate MD5 hash
-    md5_hash = hashlib.md5(binary_data).hexdigest()
-
     # Check for existing firmware with same node_type, version, hardware
     existing = await db.execute(
-        select(Firmware).where(
+        select(Firmware.id).where(
             Firmware.node_type == node_type,
             Firmware.version == version,
             Firmware.hardware == hardware,
         )
     )
+    already_exists = HTTPException(
+        status_code=409,
+        detail=f"Firmware already exists for {node_type} v{version} ({hardware})"
+    )
     if existing.scalar_one_or_none():
-        raise HTTPException(
-            status_code=409,
-            detail=f"Firmware already exists for {node_type} v{version} ({hardware})"
-        )
+        raise already_exists
+
+    # Copy the upload to disk and hash it in one pass off the event loop,
+    # so the image is never held in memory
+    await file.seek(0)
+    md5_hash, size_bytes, storage_path = await asyncio.to_thread(
+        store_blob, file.file, Path(settings.firmware_storage_dir)
+    )
 
     # Create firmware record
     firmware = Firmware(
@@ -51,13 +135,19 @@ async def upload_firmware(
         filename=file.filename or f"{node_type}_{version}.bin",
         size_bytes=size_bytes,
         md5_hash=md5_hash,
-        binary_data=binary_data,
+        storage_path=str(storage_path),
         release_notes=release_notes,
         is_stable=is_stable,
     )
 
     db.add(firmware)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same version won; this blob is unused
+        await db.rollback()
+        storage_path.unlink(missing_ok=True)
+        raise already_exists
     await db.refresh(firmware)
 
     return FirmwareOut(
@@ -80,13 +170,13 @@ async def list_firmware(
     db: AsyncSession = Depends(get_db),
 ):
     """List all firmware versions, optionally filtered by node type."""
-    query = select(Firmware).order_by(Firmware.node_type, Firmware.version.desc())
+    query = select(*FIRMWARE_OUT_COLUMNS).order_by(Firmware.node_type, Firmware.version.desc())
 
     if node_type:
         query = query.where(Firmware.node_type == node_type)
 
     result = await db.execute(query)
-    firmware_list = result.scalars().all()
+    firmware_list = result.mappings().all()
 
     # Get total count
     count_query = select(func.count(Firmware.id))
@@ -94,63 +184,65 @@ async def list_firmware(
         count_query = count_query.where(Firmware.node_type == node_type)
     total = (await db.execute(count_query)).scalar() or 0
 
-    return FirmwareList(
-        items=[
-            FirmwareOut(
-                id=fw.id,
-                node_type=fw.node_type,
-                version=fw.version,
-                hardware=fw.hardware,
-                filename=fw.filename,
-                size_bytes=fw.size_bytes,
-                md5_hash=fw.md5_hash,
-                release_notes=fw.release_notes,
-                is_stable=fw.is_stable,
-                created_at=fw.created_at,
-            )
-            for fw in firmware_list
-        ],
-        total=total,
-    )
+    return ORJSONResponse({
+        "items": [dict(fw) for fw in firmware_list],
+        "total": total,
+    })
 
 
 @router.get("/{firmware_id}", response_model=FirmwareOut)
 async def get_firmware(firmware_id: int, db: AsyncSession = Depends(get_db)):
     """Get firmware metadata by ID."""
-    result = await db.execute(select(Firmware).where(Firmware.id == firmware_id))
-    firmware = result.scalar_one_or_none()
+    result = await db.execute(GET_FIRMWARE_STMT, {"id": firmware_id})
+    firmware = result.mappings().one_or_none()
 
     if not firmware:
         raise HTTPException(status_code=404, detail="Firmware not found")
 
-    return FirmwareOut(
-        id=firmware.id,
-        node_type=firmware.node_type,
-        version=firmware.version,
-        hardware=firmware.hardware,
-        filename=firmware.filename,
-        size_bytes=firmware.size_bytes,
-        md5_hash=firmware.md5_hash,
-        release_notes=firmware.release_notes,
-        is_stable=firmware.is_stable,
-        created_at=firmware.created_at,
-    )
+    return FirmwareOut(**firmware)
 
 
 @router.get("/{firmware_id}/download")
 async def download_firmware(
     firmware_id: int,
     range: str | None = Header(None),
+    if_none_match: str | None = Header(None),
+    x_sendfile_type: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Download firmware binary file. Supports Range header for partial downloads."""
-    result = await db.execute(select(Firmware).where(Firmware.id == firmware_id))
-    firmware = result.scalar_one_or_none()
+    """Download firmware binary file.
+
+    Supports Range header for partial downloads and If-None-Match (the
+    ETag is the MD5 hash) so nodes re-checking firmware get a 304.
+    Behind nginx (X-Sendfile-Type: X-Accel-Redirect) the bytes are sent
+    by the proxy and this handler only returns headers.
+    """
+    result = await db.execute(DOWNLOAD_FIRMWARE_STMT, {"id": firmware_id})
+    firmware = result.one_or_none()
 
     if not firmware:
         raise HTTPException(status_code=404, detail="Firmware not found")
 
-    binary_data = firmware.binary_data
+    etag = f'"{firmware.md5_hash}"'
+    cache_headers = {"ETag": etag, "Cache-Control": DOWNLOAD_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    if not os.path.exists(firmware.storage_path):
+        raise HTTPException(status_code=404, detail="Firmware binary missing from storage")
+
+    if x_sendfile_type == "X-Accel-Redirect":
+        # nginx serves the file (including Range requests) via sendfile
+        return Response(
+            media_type="application/octet-stream",
+            headers={
+                "X-Accel-Redirect": f"{settings.firmware_accel_redirect_prefix}{Path(firmware.storage_path).name}",
+                "Content-Disposition": f'attachment; filename="{firmware.filename}"',
+                "X-MD5": firmware.md5_hash,
+                **cache_headers,
+            },
+        )
+
     total_size = firmware.size_bytes
 
     # Handle Range header for partial content requests
@@ -166,27 +258,29 @@ async def download_firmware(
                 raise HTTPException(status_code=416, detail="Range Not Satisfiable")
 
             # Return partial content
-            partial_data = binary_data[start:end + 1]
-            return Response(
-                content=partial_data,
+            length = end - start + 1
+            return StreamingResponse(
+                iter_file_range(firmware.storage_path, start, length),
                 status_code=206,
                 media_type="application/octet-stream",
                 headers={
                     "Content-Range": f"bytes {start}-{end}/{total_size}",
-                    "Content-Length": str(len(partial_data)),
+                    "Content-Length": str(length),
                     "Accept-Ranges": "bytes",
+                    "X-MD5": firmware.md5_hash,
+                    **cache_headers,
                 },
             )
 
-    # Full download
-    return Response(
-        content=binary_data,
+    # Full download (sent with sendfile where the server supports it)
+    return FileResponse(
+        firmware.storage_path,
         media_type="application/octet-stream",
+        filename=firmware.filename,
         headers={
-            "Content-Disposition": f'attachment; filename="{firmware.filename}"',
-            "Content-Length": str(total_size),
             "Accept-Ranges": "bytes",
             "X-MD5": firmware.md5_hash,
+            **cache_headers,
         },
     )
 
@@ -194,14 +288,26 @@ async def download_firmware(
 @router.delete("/{firmware_id}")
 async def delete_firmware(firmware_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a firmware entry."""
-    result = await db.execute(select(Firmware).where(Firmware.id == firmware_id))
-    firmware = result.scalar_one_or_none()
+    result = await db.execute(
+        delete(Firmware)
+        .where(Firmware.id == firmware_id)
+        .returning(Firmware.filename, Firmware.storage_path)
+    )
+    firmware = result.one_or_none()
 
     if not firmware:
         raise HTTPException(status_code=404, detail="Firmware not found")
 
-    await db.delete(firmware)
     await db.commit()
+    invalidate_pending_cache()  # Its OTA updates were cascaded away
+
+    # Blobs from before per-upload naming (<md5>.bin) may be shared by
+    # identical binaries; only remove one once unreferenced
+    still_used = await db.execute(
+        select(Firmware.id).where(Firmware.storage_path == firmware.storage_path).limit(1)
+    )
+    if still_used.scalar_one_or_none() is None:
+        Path(firmware.storage_path).unlink(missing_ok=True)
 
     return {"message": f"Firmware {firmware_id} deleted", "filename": firmware.filename}
 
@@ -213,25 +319,17 @@ async def mark_firmware_stable(
     db: AsyncSession = Depends(get_db),
 ):
     """Mark or unmark firmware as stable release."""
-    result = await db.execute(select(Firmware).where(Firmware.id == firmware_id))
-    firmware = result.scalar_one_or_none()
+    result = await db.execute(
+        update(Firmware)
+        .where(Firmware.id == firmware_id)
+        .values(is_stable=is_stable)
+        .returning(*FIRMWARE_OUT_COLUMNS)
+    )
+    firmware = result.mappings().one_or_none()
 
     if not firmware:
         raise HTTPException(status_code=404, detail="Firmware not found")
 
-    firmware.is_stable = is_stable
     await db.commit()
-    await db.refresh(firmware)
 
-    return FirmwareOut(
-        id=firmware.id,
-        node_type=firmware.node_type,
-        version=firmware.version,
-        hardware=firmware.hardware,
-        filename=firmware.filename,
-        size_bytes=firmware.size_bytes,
-        md5_hash=firmware.md5_hash,
-        release_notes=firmware.release_notes,
-        is_stable=firmware.is_stable,
-        created_at=firmware.created_at,
-    )
+    return FirmwareOut(**firmware)
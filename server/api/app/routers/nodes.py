@@ -1,49 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, delete
+from sqlalchemy import select, func, delete, update as sql_update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..caching import forget_node
 from ..database import get_db
-from ..models import Node, Telemetry
-from ..schemas import NodeOut, NodeUpdate
+from ..models import Node, Telemetry, CurrentState
+from ..responses import ORJSONResponse
+from ..schemas import NodeId, NodeOut, NodeUpdate, format_node_id
 
 router = APIRouter(prefix="/api/v1/nodes", tags=["nodes"])
 
+# Latest peer_count per node in one pass (DISTINCT ON walks the
+# telemetry (node_id, time DESC) index) instead of one query per node
+_latest_peer_count = (
+    select(Telemetry.node_id, Telemetry.peer_count)
+    .distinct(Telemetry.node_id)
+    .order_by(Telemetry.node_id, Telemetry.time.desc())
+    .subquery()
+)
+LIST_NODES_STMT = (
+    select(
+        func.to_hex(Node.id).label("id"),
+        Node.name,
+        Node.firmware_version,
+        Node.ip_address,
+        Node.first_seen,
+        Node.last_seen,
+        Node.is_online,
+        Node.role,
+        _latest_peer_count.c.peer_count,
+    )
+    .outerjoin(_latest_peer_count, _latest_peer_count.c.node_id == Node.id)
+    .order_by(Node.last_seen.desc())
+)
+
 
 @router.get("", response_model=list[NodeOut])
 async def list_nodes(db: AsyncSession = Depends(get_db)):
     """List all registered nodes."""
-    result = await db.execute(select(Node).order_by(Node.last_seen.desc()))
-    nodes = result.scalars().all()
-
-    # Get latest peer_count for each node from telemetry
-    nodes_out = []
-    for node in nodes:
-        telem_result = await db.execute(
-            select(Telemetry.peer_count)
-            .where(Telemetry.node_id == node.id)
-            .order_by(Telemetry.time.desc())
-            .limit(1)
-        )
-        peer_count = telem_result.scalar()
-
-        node_dict = {
-            "id": node.id,
-            "name": node.name,
-            "firmware_version": node.firmware_version,
-            "ip_address": node.ip_address,
-            "first_seen": node.first_seen,
-            "last_seen": node.last_seen,
-            "is_online": node.is_online,
-            "role": node.role,
-            "peer_count": peer_count,
-        }
-        nodes_out.append(NodeOut(**node_dict))
-
-    return nodes_out
+    result = await db.execute(LIST_NODES_STMT)
+    return ORJSONResponse([dict(row) for row in result.mappings()])
 
 
 @router.get("/{node_id}", response_model=NodeOut)
-async def get_node(node_id: str, db: AsyncSession = Depends(get_db)):
+async def get_node(node_id: NodeId, db: AsyncSession = Depends(get_db)):
     """Get details for a specific node."""
     result = await db.execute(select(Node).where(Node.id == node_id))
     node = result.scalar_one_or_none()
@@ -74,32 +74,36 @@ async def get_node(node_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.delete("/{node_id}")
-async def delete_node(node_id: str, db: AsyncSession = Depends(get_db)):
+async def delete_node(node_id: NodeId, db: AsyncSession = Depends(get_db)):
     """Remove a node and all its data."""
-    result = await db.execute(select(Node).where(Node.id == node_id))
-    node = result.scalar_one_or_none()
-
-    if not node:
+    result = await db.execute(delete(Node).where(Node.id == node_id).returning(Node.id))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Node not found")
+    # current_state has no foreign key to cascade; without this, the
+    # leftover state would be served by get_node_state instead of a 404
+    await db.execute(delete(CurrentState).where(CurrentState.node_id == node_id))
 
-    await db.execute(delete(Node).where(Node.id == node_id))
     await db.commit()
+    forget_node(node_id)
 
-    return {"message": f"Node {node_id} deleted"}
+    return {"message": f"Node {format_node_id(node_id)} deleted"}
 
 
 @router.put("/{node_id}/name", response_model=NodeOut)
-async def update_node_name(node_id: str, update: NodeUpdate, db: AsyncSession = Depends(get_db)):
+async def update_node_name(node_id: NodeId, update: NodeUpdate, db: AsyncSession = Depends(get_db)):
     """Update a node's display name."""
-    result = await db.execute(select(Node).where(Node.id == node_id))
+    result = await db.execute(
+        sql_update(Node)
+        .where(Node.id == node_id)
+        .values(name=update.name)
+        .returning(Node)
+    )
     node = result.scalar_one_or_none()
 
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    node.name = update.name
     await db.commit()
-    await db.refresh(node)
 
     return NodeOut(
         id=node.id,
@@ -1,20 +1,46 @@
-import math
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import Response
+from sqlalchemy import select, insert, func, update as sql_update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from ..caching import etag_matches, invalidate_pending_cache, pending_cache
 from ..database import get_db
 from ..models import Firmware, OTAUpdate, OTANodeStatus
+from ..responses import ORJSONResponse, dumps
 from ..schemas import (
     OTAUpdateCreate, OTAUpdateOut, OTAUpdateStatus,
-    OTAPendingUpdate, OTANodeStatusOut, OTAProgressReport
+    OTAPendingUpdate, OTANodeStatusOut, OTAProgressReport, OTAProgressReportWithNode,
+    NodeId, format_node_id,
 )
 
 router = APIRouter(prefix="/api/v1/ota", tags=["ota"])
 
-OTA_PART_SIZE = 1024  # Bytes per chunk for painlessMesh OTA
+def announced_columns(updates):
+    """OTAPendingUpdate fields, for `updates` being OTAUpdate or a CTE over it."""
+    return (
+        updates.id.label("update_id"),
+        Firmware.id.label("firmware_id"),
+        Firmware.node_type,
+        Firmware.version,
+        Firmware.hardware,
+        Firmware.md5_hash.label("md5"),
+        Firmware.num_parts,
+        Firmware.size_bytes,
+        func.to_hex(updates.target_node_id).label("target_node_id"),
+        updates.force_update.label("force"),
+    )
+
+
+# Gateway poll statement, built once at import
+PENDING_UPDATES_STMT = (
+    select(*announced_columns(OTAUpdate))
+    .join(Firmware, OTAUpdate.firmware_id == Firmware.id)
+    .where(OTAUpdate.status == "pending")
+    .order_by(OTAUpdate.created_at)
+)
 
 
 @router.post("/updates", response_model=OTAUpdateOut)
@@ -38,7 +64,29 @@ async def create_update(
     )
 
     db.add(ota_update)
+    await db.flush()
+
+    # Seed pending statuses for the known targets in one multi-row INSERT
+    # so progress has a fixed denominator. The server doesn't track node
+    # types, so type-wide updates get their rows on first progress report.
+    target_node_ids = [update.target_node_id] if update.target_node_id else []
+    if target_node_ids:
+        await db.execute(
+            insert(OTANodeStatus),
+            [
+                {
+                    "update_id": ota_update.id,
+                    "node_id": node_id,
+                    "status": "pending",
+                    "current_part": 0,
+                    "total_parts": firmware.num_parts,
+                }
+                for node_id in target_node_ids
+            ],
+        )
+
     await db.commit()
+    invalidate_pending_cache()
     await db.refresh(ota_update)
 
     return OTAUpdateOut(
@@ -51,6 +99,7 @@ async def create_update(
         created_at=ota_update.created_at,
         started_at=ota_update.started_at,
         completed_at=ota_update.completed_at,
+        total_nodes=len(target_node_ids),
     )
 
 
@@ -59,59 +108,99 @@ async def list_updates(
     status: str | None = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List all OTA update jobs."""
-    query = select(OTAUpdate).order_by(OTAUpdate.created_at.desc())
+    """List all OTA update jobs with per-update node progress counts."""
+    query = (
+        select(
+            OTAUpdate.id,
+            OTAUpdate.firmware_id,
+            func.to_hex(OTAUpdate.target_node_id).label("target_node_id"),
+            OTAUpdate.target_node_type,
+            OTAUpdate.status,
+            OTAUpdate.force_update,
+            OTAUpdate.created_at,
+            OTAUpdate.started_at,
+            OTAUpdate.completed_at,
+            func.count(OTANodeStatus.id).label("total_nodes"),
+            func.count(OTANodeStatus.id)
+            .filter(OTANodeStatus.status == "completed")
+            .label("completed_nodes"),
+        )
+        .outerjoin(OTANodeStatus, OTANodeStatus.update_id == OTAUpdate.id)
+        .group_by(OTAUpdate.id)
+        .order_by(OTAUpdate.created_at.desc())
+    )
     if status:
         query = query.where(OTAUpdate.status == status)
 
     result = await db.execute(query)
-    updates = result.scalars().all()
-
-    return [
-        OTAUpdateOut(
-            id=u.id,
-            firmware_id=u.firmware_id,
-            target_node_id=u.target_node_id,
-            target_node_type=u.target_node_type,
-            status=u.status,
-            force_update=u.force_update,
-            created_at=u.created_at,
-            started_at=u.started_at,
-            completed_at=u.completed_at,
-        )
-        for u in updates
-    ]
+    return ORJSONResponse([dict(row) for row in result.mappings()])
 
 
 @router.get("/updates/pending", response_model=list[OTAPendingUpdate])
-async def get_pending_updates(db: AsyncSession = Depends(get_db)):
-    """Gateway polls this endpoint for pending updates."""
-    result = await db.execute(
-        select(OTAUpdate, Firmware)
-        .join(Firmware)
+async def get_pending_updates(
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Gateway polls this endpoint for pending updates.
+
+    Served from an in-process cache; unchanged polls get a 304.
+    """
+    cached = pending_cache.get()
+    if cached:
+        etag, body = cached
+    else:
+        generation = pending_cache.generation
+        result = await db.execute(PENDING_UPDATES_STMT)
+        body = dumps([dict(row) for row in result.mappings()])
+        etag = pending_cache.set(body, generation)
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.post("/updates/claim", response_model=list[OTAPendingUpdate])
+async def claim_pending_updates(
+    limit: int = Query(default=1, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """Atomically claim pending updates and mark them distributing.
+
+    Replaces poll + start for gateways sharing a mesh: rows locked by
+    another gateway's claim are skipped, so each update is handed out
+    exactly once.
+    """
+    pending = (
+        select(OTAUpdate.id)
         .where(OTAUpdate.status == "pending")
         .order_by(OTAUpdate.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
     )
-
-    updates = []
-    for update, firmware in result.all():
-        num_parts = math.ceil(firmware.size_bytes / OTA_PART_SIZE)
-        updates.append(
-            OTAPendingUpdate(
-                update_id=update.id,
-                firmware_id=firmware.id,
-                node_type=firmware.node_type,
-                version=firmware.version,
-                hardware=firmware.hardware,
-                md5=firmware.md5_hash,
-                num_parts=num_parts,
-                size_bytes=firmware.size_bytes,
-                target_node_id=update.target_node_id,
-                force=update.force_update,
-            )
+    claimed = (
+        sql_update(OTAUpdate)
+        .where(OTAUpdate.id.in_(pending))
+        .values(status="distributing", started_at=func.now())
+        .returning(
+            OTAUpdate.id,
+            OTAUpdate.firmware_id,
+            OTAUpdate.target_node_id,
+            OTAUpdate.force_update,
+            OTAUpdate.created_at,
         )
+        .cte("claimed")
+    )
+    result = await db.execute(
+        select(*announced_columns(claimed.c))
+        .join(Firmware, Firmware.id == claimed.c.firmware_id)
+        .order_by(claimed.c.created_at)
+    )
+    updates = [dict(row) for row in result.mappings()]
+    await db.commit()
 
-    return updates
+    if updates:
+        invalidate_pending_cache()
+    return ORJSONResponse(updates)
 
 
 @router.get("/updates/{update_id}", response_model=OTAUpdateStatus)
@@ -155,80 +244,116 @@ async def get_update_status(update_id: int, db: AsyncSession = Depends(get_db)):
 @router.post("/updates/{update_id}/start")
 async def start_update(update_id: int, db: AsyncSession = Depends(get_db)):
     """Gateway calls this when it starts distributing an update."""
-    result = await db.execute(select(OTAUpdate).where(OTAUpdate.id == update_id))
-    update = result.scalar_one_or_none()
-
-    if not update:
-        raise HTTPException(status_code=404, detail="Update not found")
-
-    if update.status != "pending":
-        raise HTTPException(status_code=400, detail=f"Update is not pending (status: {update.status})")
+    result = await db.execute(
+        sql_update(OTAUpdate)
+        .where(OTAUpdate.id == update_id, OTAUpdate.status == "pending")
+        .values(status="distributing", started_at=func.now())
+        .returning(OTAUpdate.id)
+    )
+    if result.scalar_one_or_none() is None:
+        # Only look the row up again to explain why nothing matched
+        status = (await db.execute(
+            select(OTAUpdate.status).where(OTAUpdate.id == update_id)
+        )).scalar_one_or_none()
+        if status is None:
+            raise HTTPException(status_code=404, detail="Update not found")
+        raise HTTPException(status_code=400, detail=f"Update is not pending (status: {status})")
 
-    update.status = "distributing"
-    update.started_at = datetime.utcnow()
     await db.commit()
+    invalidate_pending_cache()
 
     return {"status": "distributing", "update_id": update_id}
 
 
+async def upsert_node_progress(
+    db: AsyncSession,
+    update_id: int,
+    reports: dict[int, OTAProgressReport],
+) -> None:
+    """Write progress for several nodes in one INSERT ... ON CONFLICT.
+
+    started_at is only set by a node's first report (rows seeded at
+    create time start out NULL). Raises 404 if the update doesn't exist.
+    """
+    now = func.now()
+    stmt = pg_insert(OTANodeStatus).values([
+        {
+            "update_id": update_id,
+            "node_id": node_id,
+            "status": progress.status,
+            "current_part": progress.current_part,
+            "total_parts": progress.total_parts,
+            "error_message": progress.error_message,
+            "started_at": now,
+            "completed_at": now if progress.status in ("completed", "failed") else None,
+        }
+        for node_id, progress in reports.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OTANodeStatus.update_id, OTANodeStatus.node_id],
+        set_={
+            **{
+                col: stmt.excluded[col]
+                for col in ("status", "current_part", "total_parts", "error_message", "completed_at")
+            },
+            "started_at": func.coalesce(OTANodeStatus.started_at, stmt.excluded.started_at),
+        },
+    )
+
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except IntegrityError:
+        # update_id foreign key violation
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Update not found")
+
+
 @router.post("/updates/{update_id}/node/{node_id}/progress")
 async def report_node_progress(
     update_id: int,
-    node_id: str,
+    node_id: NodeId,
     progress: OTAProgressReport,
     db: AsyncSession = Depends(get_db),
 ):
     """Gateway reports progress for a specific node."""
-    # Verify update exists
-    update_result = await db.execute(select(OTAUpdate).where(OTAUpdate.id == update_id))
-    update = update_result.scalar_one_or_none()
-    if not update:
-        raise HTTPException(status_code=404, detail="Update not found")
-
-    # Get or create node status
-    result = await db.execute(
-        select(OTANodeStatus).where(
-            OTANodeStatus.update_id == update_id,
-            OTANodeStatus.node_id == node_id,
-        )
-    )
-    node_status = result.scalar_one_or_none()
+    await upsert_node_progress(db, update_id, {node_id: progress})
 
-    if not node_status:
-        node_status = OTANodeStatus(
-            update_id=update_id,
-            node_id=node_id,
-            started_at=datetime.utcnow(),
-        )
-        db.add(node_status)
+    return {"status": "ok", "node_id": format_node_id(node_id), "progress": f"{progress.current_part}/{progress.total_parts}"}
 
-    node_status.status = progress.status
-    node_status.current_part = progress.current_part
-    node_status.total_parts = progress.total_parts
-    node_status.error_message = progress.error_message
 
-    if progress.status == "completed":
-        node_status.completed_at = datetime.utcnow()
-    elif progress.status == "failed":
-        node_status.completed_at = datetime.utcnow()
+@router.post("/updates/{update_id}/progress/bulk")
+async def report_bulk_progress(
+    update_id: int,
+    reports: list[OTAProgressReportWithNode],
+    db: AsyncSession = Depends(get_db),
+):
+    """Gateway reports progress for many nodes in a single request."""
+    if not reports:
+        return {"status": "ok", "updated": 0}
 
-    await db.commit()
+    # One row per node; a later report for the same node wins (Postgres
+    # rejects an upsert that touches the same row twice)
+    by_node = {report.node_id: report for report in reports}
+    await upsert_node_progress(db, update_id, by_node)
 
-    return {"status": "ok", "node_id": node_id, "progress": f"{progress.current_part}/{progress.total_parts}"}
+    return {"status": "ok", "updated": len(by_node)}
 
 
 @router.post("/updates/{update_id}/complete")
 async def complete_update(update_id: int, db: AsyncSession = Depends(get_db)):
     """Gateway calls this when update distribution is complete."""
-    result = await db.execute(select(OTAUpdate).where(OTAUpdate.id == update_id))
-    update = result.scalar_one_or_none()
-
-    if not update:
+    result = await db.execute(
+        sql_update(OTAUpdate)
+        .where(OTAUpdate.id == update_id)
+        .values(status="completed", completed_at=func.now())
+        .returning(OTAUpdate.id)
+    )
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Update not found")
 
-    update.status = "completed"
-    update.completed_at = datetime.utcnow()
     await db.commit()
+    invalidate_pending_cache()
 
     return {"status": "completed", "update_id": update_id}
 
@@ -240,15 +365,17 @@ async def fail_update(
     db: AsyncSession = Depends(get_db),
 ):
     """Mark an update as failed."""
-    result = await db.execute(select(OTAUpdate).where(OTAUpdate.id == update_id))
-    update = result.scalar_one_or_none()
-
-    if not update:
+    result = await db.execute(
+        sql_update(OTAUpdate)
+        .where(OTAUpdate.id == update_id)
+        .values(status="failed", completed_at=func.now())
+        .returning(OTAUpdate.id)
+    )
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Update not found")
 
-    update.status = "failed"
-    update.completed_at = datetime.utcnow()
     await db.commit()
+    invalidate_pending_cache()
 
     return {"status": "failed", "update_id": update_id, "error": error_message}
 
@@ -256,16 +383,21 @@ async def fail_update(
 @router.delete("/updates/{update_id}")
 async def cancel_update(update_id: int, db: AsyncSession = Depends(get_db)):
     """Cancel/delete a pending update."""
-    result = await db.execute(select(OTAUpdate).where(OTAUpdate.id == update_id))
-    update = result.scalar_one_or_none()
-
-    if not update:
-        raise HTTPException(status_code=404, detail="Update not found")
-
-    if update.status == "distributing":
+    # Node statuses go with it via ON DELETE CASCADE
+    result = await db.execute(
+        delete(OTAUpdate)
+        .where(OTAUpdate.id == update_id, OTAUpdate.status != "distributing")
+        .returning(OTAUpdate.id)
+    )
+    if result.scalar_one_or_none() is None:
+        exists = (await db.execute(
+            select(OTAUpdate.id).where(OTAUpdate.id == update_id)
+        )).scalar_one_or_none()
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Update not found")
         raise HTTPException(status_code=400, detail="Cannot cancel update in progress")
 
-    await db.delete(update)
     await db.commit()
+    invalidate_pending_cache()
 
     return {"message": f"Update {update_id} cancelled"}
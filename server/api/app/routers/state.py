@@ -1,36 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..caching import etag_matches, known_nodes, node_state_cache
 from ..database import get_db
 from ..models import Node, CurrentState
-from ..schemas import StateOut
+from ..responses import iter_json_rows
+from ..schemas import NodeId, StateOut
 
 router = APIRouter(prefix="/api/v1", tags=["state"])
 
+# Columns for StateOut; selecting these returns plain rows instead of
+# hydrating ORM objects
+STATE_OUT_COLUMNS = (
+    CurrentState.node_id,
+    CurrentState.key,
+    CurrentState.value,
+    CurrentState.version,
+    CurrentState.updated_at,
+)
+# Validates a whole result in one call instead of model_validate per row
+STATE_OUT_LIST = TypeAdapter(list[StateOut])
+
+ALL_STATE_STMT = select(
+    func.to_hex(CurrentState.node_id).label("node_id"),
+    CurrentState.key,
+    CurrentState.value,
+    CurrentState.version,
+    CurrentState.updated_at,
+).order_by(CurrentState.node_id, CurrentState.key)
+NODE_EXISTS_STMT = select(Node.id).where(Node.id == bindparam("node_id"))
+NODE_STATE_STMT = (
+    select(*STATE_OUT_COLUMNS)
+    .where(CurrentState.node_id == bindparam("node_id"))
+    .order_by(CurrentState.key)
+)
+
 
 @router.get("/state", response_model=list[StateOut])
-async def get_all_state(db: AsyncSession = Depends(get_db)):
+async def get_all_state():
     """Get current state from all nodes."""
-    result = await db.execute(
-        select(CurrentState).order_by(CurrentState.node_id, CurrentState.key)
-    )
-    states = result.scalars().all()
-    return [StateOut.model_validate(s) for s in states]
+    return StreamingResponse(iter_json_rows(ALL_STATE_STMT), media_type="application/json")
 
 
 @router.get("/nodes/{node_id}/state", response_model=list[StateOut])
-async def get_node_state(node_id: str, db: AsyncSession = Depends(get_db)):
-    """Get current state for a specific node."""
-    # Check node exists
-    node_result = await db.execute(select(Node).where(Node.id == node_id))
-    if not node_result.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="Node not found")
-
-    result = await db.execute(
-        select(CurrentState)
-        .where(CurrentState.node_id == node_id)
-        .order_by(CurrentState.key)
-    )
-    states = result.scalars().all()
-    return [StateOut.model_validate(s) for s in states]
+async def get_node_state(
+    node_id: NodeId,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get current state for a specific node.
+
+    Served from an in-process cache that pushes changing the node's state
+    invalidate; unchanged polls get a 304.
+    """
+    cached = node_state_cache.get(node_id)
+    if cached:
+        etag, body = cached
+    else:
+        generation = node_state_cache.generation
+        result = await db.execute(NODE_STATE_STMT, {"node_id": node_id})
+        rows = result.all()
+
+        # State rows imply the node exists; only check when there are none
+        if not rows and node_id not in known_nodes:
+            node_result = await db.execute(NODE_EXISTS_STMT, {"node_id": node_id})
+            if node_result.scalar_one_or_none() is None:
+                raise HTTPException(status_code=404, detail="Node not found")
+            known_nodes.add(node_id)
+
+        body = STATE_OUT_LIST.dump_json(STATE_OUT_LIST.validate_python(rows, from_attributes=True))
+        etag = node_state_cache.set(node_id, body, generation)
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
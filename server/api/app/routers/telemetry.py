@@ -1,131 +1,260 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+import logging
+import re
+from datetime import timedelta
+
+import msgspec
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ARRAY, Integer, Interval, String, Text, bindparam, func, insert, literal, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..caching import invalidate_node_state, known_nodes
+from ..config import settings
 from ..database import get_db
-from ..models import Node, Telemetry, CurrentState, StateHistory
-from ..schemas import TelemetryIn, TelemetryOut
+from ..ingest import telemetry_buffer, state_history_buffer
+from ..models import Node, Telemetry, CurrentState, StateHistory, telemetry_1m
+from ..responses import iter_json_rows
+from ..schemas import NodeId, TelemetryIn, TelemetryOut, format_node_id
 
 router = APIRouter(prefix="/api/v1/nodes", tags=["telemetry"])
+logger = logging.getLogger(__name__)
+
+# Lax like the Pydantic model it replaced: numeric strings such as
+# "heap_free": "1234" still decode as integers
+_telemetry_in_decoder = msgspec.json.Decoder(TelemetryIn, strict=False)
+# msgspec errors end with the failing path, e.g. "... - at `$.uptime`"
+_msgspec_error_path = re.compile(r"^(?P<msg>.*) - at `\$(?P<path>[^`]*)`$", re.DOTALL)
+# FastAPI can't derive a request body schema from a Struct; document it
+_telemetry_in_schema = msgspec.json.schema(TelemetryIn)["$defs"]["TelemetryIn"]
+
+# push_telemetry writes everything in one statement of chained CTEs:
+#   n: upsert the node; omitted name/firmware/role (NULL) keep stored values
+#   t: insert the telemetry row
+#   s: upsert each state key; unchanged values are skipped and return no row
+#   h: insert a state_history row for each key s changed
+# Every row is timestamped with the transaction's now(), returned by n
+_nodes = Node.__table__
+_insert_node = pg_insert(_nodes).values(
+    id=bindparam("node_id"),
+    name=bindparam("new_name", type_=String),
+    firmware_version=bindparam("new_firmware", type_=String),
+    role=func.coalesce(bindparam("new_role", type_=String), "NODE"),
+    first_seen=func.now(),
+    last_seen=func.now(),
+    is_online=True,
+)
+_node_cte = _insert_node.on_conflict_do_update(
+    index_elements=[_nodes.c.id],
+    set_={
+        "last_seen": _insert_node.excluded.last_seen,
+        "is_online": True,
+        "name": func.coalesce(_insert_node.excluded.name, _nodes.c.name),
+        "firmware_version": func.coalesce(_insert_node.excluded.firmware_version, _nodes.c.firmware_version),
+        "role": func.coalesce(bindparam("new_role", type_=String), _nodes.c.role),
+        "updated_at": func.now(),
+    },
+).returning(_nodes.c.id, _nodes.c.last_seen).cte("n")
+
+_telemetry_cte = insert(Telemetry.__table__).from_select(
+    ["time", "node_id", "heap_free", "uptime_sec", "peer_count", "role"],
+    select(
+        _node_cte.c.last_seen,
+        _node_cte.c.id,
+        bindparam("heap_free", type_=Integer),
+        bindparam("uptime_sec", type_=Integer),
+        bindparam("peer_count", type_=Integer),
+        bindparam("role", type_=String),
+    ),
+).cte("t")
+
+_current_state = CurrentState.__table__
+_state_pairs = func.unnest(
+    bindparam("keys", type_=ARRAY(String)),
+    bindparam("values", type_=ARRAY(Text)),
+).table_valued("key", "value").render_derived(name="x")
+_insert_state = pg_insert(_current_state).from_select(
+    ["node_id", "key", "value", "version", "updated_at"],
+    select(_node_cte.c.id, _state_pairs.c.key, _state_pairs.c.value, literal(1), _node_cte.c.last_seen)
+    .select_from(_node_cte)
+    .join(_state_pairs, true()),
+)
+_state_cte = _insert_state.on_conflict_do_update(
+    index_elements=[_current_state.c.node_id, _current_state.c.key],
+    set_={
+        "value": _insert_state.excluded.value,
+        "version": _current_state.c.version + 1,
+        "updated_at": _insert_state.excluded.updated_at,
+    },
+    where=_current_state.c.value.is_distinct_from(_insert_state.excluded.value),
+).returning(
+    _current_state.c.node_id,
+    _current_state.c.key,
+    _current_state.c.value,
+    _current_state.c.version,
+    _current_state.c.updated_at,
+).cte("s")
+
+_history_cte = insert(StateHistory.__table__).from_select(
+    ["time", "node_id", "key", "value", "version"],
+    select(
+        _state_cte.c.updated_at,
+        _state_cte.c.node_id,
+        _state_cte.c.key,
+        _state_cte.c.value,
+        _state_cte.c.version,
+    ),
+).cte("h")
+
+PUSH_TELEMETRY_STMT = select(
+    _node_cte.c.last_seen,
+    select(func.count()).select_from(_state_cte).scalar_subquery().label("changed"),
+).add_cte(_telemetry_cte, _history_cte)
+# With the COPY ingest buffer running, only the node and state are written
+# here; the changed keys come back (one row with NULL key if none changed)
+# so their telemetry and history rows can be buffered
+PUSH_STATE_STMT = (
+    select(_node_cte.c.last_seen, _state_cte.c.key, _state_cte.c.value, _state_cte.c.version)
+    .select_from(_node_cte)
+    .outerjoin(_state_cte, true())
+)
+
+NODE_HISTORY_STMT = (
+    select(
+        Telemetry.time,
+        func.to_hex(Telemetry.node_id).label("node_id"),
+        Telemetry.heap_free,
+        Telemetry.uptime_sec,
+        Telemetry.peer_count,
+        Telemetry.role,
+    )
+    .where(
+        Telemetry.node_id == bindparam("node_id"),
+        Telemetry.time >= func.now() - bindparam("window", type_=Interval),
+    )
+    .order_by(Telemetry.time.desc())
+)
+# Same shape from the 1-minute continuous aggregate, for long windows
+NODE_HISTORY_1M_STMT = (
+    select(
+        telemetry_1m.c.bucket.label("time"),
+        func.to_hex(telemetry_1m.c.node_id).label("node_id"),
+        telemetry_1m.c.heap_free,
+        telemetry_1m.c.uptime_sec,
+        telemetry_1m.c.peer_count,
+        telemetry_1m.c.role,
+    )
+    .where(
+        telemetry_1m.c.node_id == bindparam("node_id"),
+        telemetry_1m.c.bucket >= func.now() - bindparam("window", type_=Interval),
+    )
+    .order_by(telemetry_1m.c.bucket.desc())
+)
+
 
+async def decode_telemetry_in(request: Request) -> TelemetryIn:
+    """Decode and validate the request body as TelemetryIn.
 
-@router.post("/{node_id}/telemetry")
-async def push_telemetry(node_id: str, data: TelemetryIn, db: AsyncSession = Depends(get_db)):
+    Errors are raised as RequestValidationError, so they get the same 422
+    body as FastAPI's own validation (e.g. of the node_id path parameter).
+    """
+    try:
+        return _telemetry_in_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:  # Also covers ValidationError
+        msg, loc = str(e), ["body"]
+        if match := _msgspec_error_path.match(msg):
+            msg = match["msg"]
+            loc += re.findall(r"\.(\w+)", match["path"])
+        error_type = "value_error" if isinstance(e, msgspec.ValidationError) else "json_invalid"
+        raise RequestValidationError([{"type": error_type, "loc": loc, "msg": msg, "input": None}])
+
+
+@router.post(
+    "/{node_id}/telemetry",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _telemetry_in_schema}},
+        },
+    },
+)
+async def push_telemetry(
+    node_id: NodeId,
+    data: TelemetryIn = Depends(decode_telemetry_in),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Push telemetry data from a node.
     Auto-registers the node if it doesn't exist.
     """
-    print(f"[TELEMETRY] node_id={node_id} payload={data.model_dump()}")
-    now = datetime.utcnow()
-
-    # Get or create node
-    result = await db.execute(select(Node).where(Node.id == node_id))
-    node = result.scalar_one_or_none()
-
-    if node:
-        # Update existing node
-        node.last_seen = now
-        node.is_online = True
-        if data.name:
-            node.name = data.name
-        if data.firmware:
-            node.firmware_version = data.firmware
-        if data.role:
-            node.role = data.role
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("telemetry node_id=%s payload=%r", format_node_id(node_id), data)
+
+    params = {
+        "node_id": node_id,
+        "new_name": data.name or None,
+        "new_firmware": data.firmware or None,
+        "new_role": data.role or None,
+        "heap_free": data.heap_free,
+        "uptime_sec": data.uptime,
+        "peer_count": data.peer_count,
+        "role": data.role,
+        "keys": list(data.state or ()),
+        "values": list((data.state or {}).values()),
+    }
+
+    if not telemetry_buffer.running:
+        # One round-trip for the node, telemetry, state and history
+        now, changed = (await db.execute(PUSH_TELEMETRY_STMT, params)).one()
     else:
-        # Create new node
-        node = Node(
-            id=node_id,
-            name=data.name,
-            firmware_version=data.firmware,
-            role=data.role or "NODE",
-            first_seen=now,
-            last_seen=now,
-            is_online=True,
-        )
-        db.add(node)
-
-    # Store telemetry
-    telemetry = Telemetry(
-        time=now,
-        node_id=node_id,
-        heap_free=data.heap_free,
-        uptime_sec=data.uptime,
-        peer_count=data.peer_count,
-        role=data.role,
-    )
-    db.add(telemetry)
-
-    # Update state if provided
-    if data.state:
-        for key, value in data.state.items():
-            # Check if state exists
-            state_result = await db.execute(
-                select(CurrentState).where(
-                    CurrentState.node_id == node_id,
-                    CurrentState.key == key
-                )
-            )
-            current_state = state_result.scalar_one_or_none()
-
-            if current_state:
-                # Only update if value changed
-                if current_state.value != value:
-                    old_version = current_state.version
-                    current_state.value = value
-                    current_state.version = old_version + 1
-                    current_state.updated_at = now
-
-                    # Record in history
-                    history = StateHistory(
-                        time=now,
-                        node_id=node_id,
-                        key=key,
-                        value=value,
-                        version=current_state.version,
-                    )
-                    db.add(history)
-            else:
-                # Create new state entry
-                new_state = CurrentState(
-                    node_id=node_id,
-                    key=key,
-                    value=value,
-                    version=1,
-                    updated_at=now,
-                )
-                db.add(new_state)
-
-                # Record in history
-                history = StateHistory(
-                    time=now,
-                    node_id=node_id,
-                    key=key,
-                    value=value,
-                    version=1,
-                )
-                db.add(history)
+        rows = (await db.execute(PUSH_STATE_STMT, params)).all()
+        now = rows[0].last_seen
+        changed = rows[0].key is not None
+
+        # Buffer telemetry and history for COPY, inserting whatever doesn't fit
+        telemetry = {
+            "time": now,
+            "node_id": node_id,
+            "heap_free": data.heap_free,
+            "uptime_sec": data.uptime,
+            "peer_count": data.peer_count,
+            "role": data.role,
+        }
+        if not telemetry_buffer.offer(telemetry):
+            await db.execute(insert(Telemetry), telemetry)
+
+        history = []
+        for row in rows:
+            if row.key is None:
+                continue
+            entry = {"time": now, "node_id": node_id, "key": row.key, "value": row.value, "version": row.version}
+            if not state_history_buffer.offer(entry):
+                history.append(entry)
+        if history:
+            await db.execute(insert(StateHistory), history)
 
     await db.commit()
+    known_nodes.add(node_id)
+    if changed:
+        invalidate_node_state(node_id)
 
-    return {"status": "ok", "node_id": node_id, "timestamp": now.isoformat()}
+    return {"status": "ok", "node_id": format_node_id(node_id), "timestamp": now.isoformat()}
 
 
 @router.get("/{node_id}/history", response_model=list[TelemetryOut])
 async def get_node_history(
-    node_id: str,
+    node_id: NodeId,
     hours: int = Query(default=24, ge=1, le=168),
-    db: AsyncSession = Depends(get_db)
 ):
-    """Get historical telemetry for a node."""
-    since = datetime.utcnow() - timedelta(hours=hours)
-
-    result = await db.execute(
-        select(Telemetry)
-        .where(Telemetry.node_id == node_id, Telemetry.time >= since)
-        .order_by(Telemetry.time.desc())
-    )
-    telemetry = result.scalars().all()
+    """Get historical telemetry for a node.
 
-    return [TelemetryOut.model_validate(t) for t in telemetry]
+    Windows of `history_rollup_min_hours` or more return 1-minute buckets
+    (average heap, max uptime, last peer count and role) instead of raw rows.
+    """
+    if hours >= settings.history_rollup_min_hours:
+        stmt = NODE_HISTORY_1M_STMT
+    else:
+        stmt = NODE_HISTORY_STMT
+    params = {"node_id": node_id, "window": timedelta(hours=hours)}
+    return StreamingResponse(iter_json_rows(stmt, params), media_type="application/json")
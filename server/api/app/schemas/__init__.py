@@ -1,10 +1,13 @@
+from .node_id import NodeId, parse_node_id, format_node_id
 from .node import NodeOut, NodeUpdate
 from .telemetry import TelemetryIn, TelemetryOut, StateOut
 from .firmware import FirmwareOut, FirmwareList, FirmwareCreate
-from .ota import OTAUpdateCreate, OTAUpdateOut, OTANodeStatusOut, OTAUpdateStatus, OTAPendingUpdate, OTAProgressReport
+from .ota import OTAUpdateCreate, OTAUpdateOut, OTANodeStatusOut, OTAUpdateStatus, OTAPendingUpdate, OTAProgressReport, OTAProgressReportWithNode
 
 __all__ = [
+    "NodeId", "parse_node_id", "format_node_id",
     "NodeOut", "NodeUpdate", "TelemetryIn", "TelemetryOut", "StateOut",
     "FirmwareOut", "FirmwareList", "FirmwareCreate",
-    "OTAUpdateCreate", "OTAUpdateOut", "OTANodeStatusOut", "OTAUpdateStatus", "OTAPendingUpdate", "OTAProgressReport"
+    "OTAUpdateCreate", "OTAUpdateOut", "OTANodeStatusOut", "OTAUpdateStatus", "OTAPendingUpdate", "OTAProgressReport",
+    "OTAProgressReportWithNode",
 ]
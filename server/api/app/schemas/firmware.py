@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class FirmwareBase(BaseModel):
@@ -23,8 +23,7 @@ class FirmwareOut(FirmwareBase):
     md5_hash: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FirmwareList(BaseModel):
@@ -1,9 +1,11 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from .node_id import NodeId
 
 
 class NodeOut(BaseModel):
-    id: str
+    id: NodeId
     name: str | None = None
     firmware_version: str | None = None
     ip_address: str | None = None
@@ -13,8 +15,7 @@ class NodeOut(BaseModel):
     role: str
     peer_count: int | None = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class NodeUpdate(BaseModel):
@@ -0,0 +1,35 @@
+import re
+from typing import Annotated
+from pydantic import BeforeValidator, PlainSerializer, WithJsonSchema
+
+MAX_NODE_ID = 2**63 - 1  # BIGINT column
+# Exactly what the published schema allows; int(value, 16) alone would
+# also take "0x1f", "1_f", "+1f" and surrounding whitespace
+NODE_ID_PATTERN = re.compile(r"[0-9a-fA-F]{1,16}")
+
+
+def parse_node_id(value: int | str) -> int:
+    """Parse a mesh node ID; the API takes them as hex, as the firmware prints them."""
+    if isinstance(value, int):
+        node_id = value
+    elif isinstance(value, str) and NODE_ID_PATTERN.fullmatch(value):
+        node_id = int(value, 16)
+    else:
+        raise ValueError("node ID must be a hexadecimal string")
+    if not 0 <= node_id <= MAX_NODE_ID:
+        raise ValueError("node ID out of range")
+    return node_id
+
+
+def format_node_id(node_id: int) -> str:
+    """Format a node ID as lowercase hex without padding (matches Postgres to_hex)."""
+    return format(node_id, "x")
+
+
+# painlessMesh node IDs are uint32s, stored as BIGINT but exchanged as hex strings
+NodeId = Annotated[
+    int,
+    BeforeValidator(parse_node_id),
+    PlainSerializer(format_node_id, return_type=str),
+    WithJsonSchema({"type": "string", "pattern": "^[0-9a-fA-F]{1,16}$", "examples": ["a1b2c3d4"]}),
+]
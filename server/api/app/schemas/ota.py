@@ -1,11 +1,13 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from .node_id import NodeId
 
 
 class OTAUpdateCreate(BaseModel):
     """Request to create an OTA update job."""
     firmware_id: int
-    target_node_id: str | None = None  # NULL = all nodes of type
+    target_node_id: NodeId | None = None  # NULL = all nodes of type
     target_node_type: str | None = None  # Defaults to firmware's node_type
     force_update: bool = False
 
@@ -14,21 +16,22 @@ class OTAUpdateOut(BaseModel):
     """OTA update job response."""
     id: int
     firmware_id: int
-    target_node_id: str | None = None
+    target_node_id: NodeId | None = None
     target_node_type: str | None = None
     status: str
     force_update: bool
     created_at: datetime
     started_at: datetime | None = None
     completed_at: datetime | None = None
+    total_nodes: int = 0  # Nodes with a status row for this update
+    completed_nodes: int = 0
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OTANodeStatusOut(BaseModel):
     """Per-node OTA progress."""
-    node_id: str
+    node_id: NodeId
     status: str
     current_part: int
     total_parts: int | None = None
@@ -36,8 +39,7 @@ class OTANodeStatusOut(BaseModel):
     started_at: datetime | None = None
     completed_at: datetime | None = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OTAUpdateStatus(BaseModel):
@@ -64,7 +66,7 @@ class OTAPendingUpdate(BaseModel):
     md5: str
     num_parts: int
     size_bytes: int
-    target_node_id: str | None = None
+    target_node_id: NodeId | None = None
     force: bool
 
 
@@ -74,3 +76,8 @@ class OTAProgressReport(BaseModel):
     total_parts: int
     status: str = "downloading"
     error_message: str | None = None
+
+
+class OTAProgressReportWithNode(OTAProgressReport):
+    """Progress report for one node within a bulk gateway report."""
+    node_id: NodeId
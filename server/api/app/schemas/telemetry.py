@@ -1,8 +1,15 @@
 from datetime import datetime
-from pydantic import BaseModel
 
+import msgspec
+from pydantic import BaseModel, ConfigDict
+
+from .node_id import NodeId
+
+
+# Decoded with msgspec rather than Pydantic: it is parsed on every push
+class TelemetryIn(msgspec.Struct, kw_only=True):
+    """Telemetry payload pushed by a node."""
 
-class TelemetryIn(BaseModel):
     name: str | None = None
     uptime: int | None = None
     heap_free: int | None = None
@@ -14,22 +21,20 @@ class TelemetryIn(BaseModel):
 
 class TelemetryOut(BaseModel):
     time: datetime
-    node_id: str
+    node_id: NodeId
     heap_free: int | None = None
     uptime_sec: int | None = None
     peer_count: int | None = None
     role: str | None = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class StateOut(BaseModel):
-    node_id: str
+    node_id: NodeId
     key: str
     value: str | None = None
     version: int
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
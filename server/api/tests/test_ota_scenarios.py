@@ -5,6 +5,10 @@ Tests typical OTA update scenarios:
 1. Golden path: one firmware, one node
 2. Multiple nodes: two nodes update successfully
 3. Partial failure: one node succeeds, one fails
+4. Cancel a pending update
+5. Bulk progress: gateway reports several nodes per request
+6. Claim: gateways atomically claim disjoint pending updates
+7. Targeted update: one node, seeded status row and progress counts
 
 Usage:
     cd server/api
@@ -210,7 +214,7 @@ async def test_scenario_1_golden_path_single_node():
 
         # Step 5: Node receives update
         print("\n[Step 5] Node receives update")
-        success = await simulate_node_progress(client, update_id, "node_pir_1", num_parts)
+        success = await simulate_node_progress(client, update_id, "a1000001", num_parts)
         assert success, "Node should complete successfully"
 
         # Step 6: Mark update completed
@@ -260,8 +264,8 @@ async def test_scenario_2_multiple_nodes():
 
         # Step 4: Two nodes receive update
         print("\n[Step 4] Two nodes receive update")
-        node1_success = await simulate_node_progress(client, update_id, "node_led_1", num_parts)
-        node2_success = await simulate_node_progress(client, update_id, "node_led_2", num_parts)
+        node1_success = await simulate_node_progress(client, update_id, "b1000001", num_parts)
+        node2_success = await simulate_node_progress(client, update_id, "b1000002", num_parts)
 
         assert node1_success and node2_success, "Both nodes should succeed"
 
@@ -313,14 +317,14 @@ async def test_scenario_3_partial_failure():
 
         # Step 4: Node 1 succeeds
         print("\n[Step 4] Node 1 receives update (success)")
-        node1_success = await simulate_node_progress(client, update_id, "node_btn_1", num_parts)
+        node1_success = await simulate_node_progress(client, update_id, "c1000001", num_parts)
         assert node1_success, "Node 1 should succeed"
 
         # Step 5: Node 2 fails
         print("\n[Step 5] Node 2 receives update (fails at part 1)")
         fail_part = min(1, num_parts)  # Fail early
         node2_success = await simulate_node_progress(
-            client, update_id, "node_btn_2", num_parts, fail_at_part=fail_part
+            client, update_id, "c1000002", num_parts, fail_at_part=fail_part
         )
         assert not node2_success, "Node 2 should fail"
 
@@ -334,8 +338,8 @@ async def test_scenario_3_partial_failure():
         assert len(status["nodes"]) == 2
 
         node_statuses = {n["node_id"]: n["status"] for n in status["nodes"]}
-        assert node_statuses["node_btn_1"] == "completed"
-        assert node_statuses["node_btn_2"] == "failed"
+        assert node_statuses["c1000001"] == "completed"
+        assert node_statuses["c1000002"] == "failed"
 
         print("\n✓ SCENARIO 3 PASSED")
         return True
@@ -375,6 +379,161 @@ async def test_scenario_4_cancel_pending():
         return True
 
 
+async def test_scenario_5_bulk_progress():
+    """
+    Scenario 5: Gateway reports progress for several nodes per request.
+    """
+    print("\n" + "=" * 60)
+    print("SCENARIO 5: Bulk Progress Reports")
+    print("=" * 60)
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await cleanup_test_data(client)
+
+        print("\n[Step 1] Upload firmware, create and start update")
+        firmware_id = await upload_test_firmware(client, "dht", "1.0.0")
+        update_id = await create_update_job(client, firmware_id)
+        pending = await simulate_gateway_poll(client)
+        num_parts = pending[0]["num_parts"]
+        await simulate_gateway_start(client, update_id)
+
+        print("\n[Step 2] Report all nodes in bulk, part by part")
+        node_ids = ["d1000001", "d1000002", "d1000003"]
+        for part in range(num_parts + 1):
+            status = "completed" if part == num_parts else "downloading"
+            reports = [
+                {"node_id": node_id, "current_part": part, "total_parts": num_parts, "status": status}
+                for node_id in node_ids
+            ]
+            resp = await client.post(
+                f"{BASE_URL}/api/v1/ota/updates/{update_id}/progress/bulk",
+                json=reports,
+            )
+            assert resp.status_code == 200, f"Bulk progress failed: {resp.text}"
+            assert resp.json()["updated"] == len(node_ids)
+        print(f"  ✓ {len(node_ids)} nodes reported {num_parts} parts in bulk")
+
+        print("\n[Step 3] Verify per-node status")
+        status = await get_update_status(client, update_id)
+        assert len(status["nodes"]) == len(node_ids)
+        assert all(n["status"] == "completed" for n in status["nodes"])
+        assert all(n["started_at"] and n["completed_at"] for n in status["nodes"])
+        print("  ✓ All nodes completed")
+
+        print("\n[Step 4] Bulk report for unknown update is rejected")
+        resp = await client.post(
+            f"{BASE_URL}/api/v1/ota/updates/999999/progress/bulk",
+            json=[{"node_id": "d1000001", "current_part": 0, "total_parts": 1}],
+        )
+        assert resp.status_code == 404
+        print("  ✓ Unknown update returns 404")
+
+        await complete_update(client, update_id)
+
+        print("\n✓ SCENARIO 5 PASSED")
+        return True
+
+
+async def test_scenario_6_claim_updates():
+    """
+    Scenario 6: Two gateways claim pending updates without overlap.
+    """
+    print("\n" + "=" * 60)
+    print("SCENARIO 6: Claim Pending Updates")
+    print("=" * 60)
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await cleanup_test_data(client)
+
+        print("\n[Step 1] Create two pending updates")
+        update_ids = {
+            await create_update_job(client, await upload_test_firmware(client, "light", "1.0.0")),
+            await create_update_job(client, await upload_test_firmware(client, "remote", "1.0.0")),
+        }
+
+        print("\n[Step 2] Each gateway claims one update")
+        claimed = []
+        for gateway in ("A", "B"):
+            resp = await client.post(f"{BASE_URL}/api/v1/ota/updates/claim", params={"limit": 1})
+            assert resp.status_code == 200, f"Claim failed: {resp.text}"
+            updates = resp.json()
+            assert len(updates) == 1
+            claimed.append(updates[0]["update_id"])
+            print(f"  ✓ Gateway {gateway} claimed update {updates[0]['update_id']}")
+        assert set(claimed) == update_ids, "Gateways should claim disjoint updates"
+
+        print("\n[Step 3] Nothing left to claim or poll")
+        resp = await client.post(f"{BASE_URL}/api/v1/ota/updates/claim", params={"limit": 5})
+        assert resp.status_code == 200 and resp.json() == []
+        pending = await simulate_gateway_poll(client)
+        assert len(pending) == 0
+        for update_id in update_ids:
+            status = await get_update_status(client, update_id)
+            assert status["status"] == "distributing"
+            await complete_update(client, update_id)
+
+        print("\n✓ SCENARIO 6 PASSED")
+        return True
+
+
+async def test_scenario_7_targeted_update():
+    """
+    Scenario 7: Update targeting one node gets a seeded status row.
+
+    1. Create an update for a single hex node ID
+    2. Update list counts the seeded node as pending
+    3. Node reports progress to completion
+    4. Counts and the seeded row's started_at reflect the progress
+    """
+    print("\n" + "=" * 60)
+    print("SCENARIO 7: Targeted Update")
+    print("=" * 60)
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await cleanup_test_data(client)
+
+        print("\n[Step 1] Upload firmware and create update for one node")
+        node_id = "e1000001"
+        firmware_id = await upload_test_firmware(client, "relay", "1.0.0")
+        update_id = await create_update_job(client, firmware_id, target_node_id=node_id)
+
+        print("\n[Step 2] Seeded node is counted before any progress")
+        resp = await client.get(f"{BASE_URL}/api/v1/ota/updates")
+        assert resp.status_code == 200
+        listed = next(u for u in resp.json() if u["id"] == update_id)
+        assert listed["target_node_id"] == node_id
+        assert listed["total_nodes"] == 1 and listed["completed_nodes"] == 0
+        status = await get_update_status(client, update_id)
+        assert len(status["nodes"]) == 1
+        seeded = status["nodes"][0]
+        assert seeded["node_id"] == node_id and seeded["status"] == "pending"
+        assert seeded["started_at"] is None
+        print("  ✓ total_nodes=1, completed_nodes=0, seeded row pending")
+
+        print("\n[Step 3] Gateway starts and node completes")
+        pending = await simulate_gateway_poll(client)
+        num_parts = pending[0]["num_parts"]
+        await simulate_gateway_start(client, update_id)
+        success = await simulate_node_progress(client, update_id, node_id, num_parts)
+        assert success, "Node should complete successfully"
+
+        print("\n[Step 4] Counts and seeded row updated")
+        resp = await client.get(f"{BASE_URL}/api/v1/ota/updates")
+        listed = next(u for u in resp.json() if u["id"] == update_id)
+        assert listed["total_nodes"] == 1 and listed["completed_nodes"] == 1
+        status = await get_update_status(client, update_id)
+        assert len(status["nodes"]) == 1, "Progress should update the seeded row"
+        node = status["nodes"][0]
+        assert node["status"] == "completed"
+        assert node["started_at"] and node["completed_at"]
+        print("  ✓ completed_nodes=1, seeded row got started_at")
+
+        await complete_update(client, update_id)
+
+        print("\n✓ SCENARIO 7 PASSED")
+        return True
+
+
 async def run_all_scenarios():
     """Run all test scenarios."""
     print("\n" + "=" * 60)
@@ -402,6 +561,9 @@ async def run_all_scenarios():
         results.append(("Scenario 2: Multiple Nodes", await test_scenario_2_multiple_nodes()))
         results.append(("Scenario 3: Partial Failure", await test_scenario_3_partial_failure()))
         results.append(("Scenario 4: Cancel Pending", await test_scenario_4_cancel_pending()))
+        results.append(("Scenario 5: Bulk Progress", await test_scenario_5_bulk_progress()))
+        results.append(("Scenario 6: Claim Updates", await test_scenario_6_claim_updates()))
+        results.append(("Scenario 7: Targeted Update", await test_scenario_7_targeted_update()))
     except Exception as e:
         print(f"\n✗ Test failed with error: {e}")
         import traceback
@@ -3,7 +3,7 @@ CREATE EXTENSION IF NOT EXISTS timescaledb;
 
 -- Nodes table
 CREATE TABLE nodes (
-    id VARCHAR(10) PRIMARY KEY,       -- Mesh node ID (hex)
+    id BIGINT PRIMARY KEY,            -- Mesh node ID (API exchanges it as hex)
     name VARCHAR(50),                  -- Human-friendly name
     firmware_version VARCHAR(20),
     ip_address VARCHAR(45),            -- IPv4 or IPv6
@@ -18,7 +18,7 @@ CREATE TABLE nodes (
 -- Telemetry time-series
 CREATE TABLE telemetry (
     time TIMESTAMPTZ NOT NULL,
-    node_id VARCHAR(10) NOT NULL,
+    node_id BIGINT NOT NULL,
     heap_free INTEGER,
     uptime_sec INTEGER,
     peer_count INTEGER,
@@ -29,7 +29,7 @@ SELECT create_hypertable('telemetry', 'time');
 
 -- Current state (latest values per node/key)
 CREATE TABLE current_state (
-    node_id VARCHAR(10) NOT NULL,
+    node_id BIGINT NOT NULL,
     key VARCHAR(50) NOT NULL,
     value TEXT,
     version INTEGER DEFAULT 1,
@@ -40,7 +40,7 @@ CREATE TABLE current_state (
 -- State history (for tracking changes over time)
 CREATE TABLE state_history (
     time TIMESTAMPTZ NOT NULL,
-    node_id VARCHAR(10) NOT NULL,
+    node_id BIGINT NOT NULL,
     key VARCHAR(50) NOT NULL,
     value TEXT,
     version INTEGER
@@ -48,14 +48,38 @@ CREATE TABLE state_history (
 SELECT create_hypertable('state_history', 'time');
 
 -- Indexes
-CREATE INDEX idx_telemetry_node_time ON telemetry (node_id, time DESC);
+-- Covers history reads so they can be served by index-only scans
+CREATE INDEX idx_telemetry_node_time ON telemetry (node_id, time DESC)
+    INCLUDE (heap_free, uptime_sec, peer_count, role);
 CREATE INDEX idx_state_history_node_key ON state_history (node_id, key, time DESC);
-CREATE INDEX idx_nodes_online ON nodes (is_online);
+CREATE INDEX idx_nodes_last_seen ON nodes (last_seen DESC);
+CREATE INDEX idx_nodes_online_last_seen ON nodes (last_seen) WHERE is_online;
 
 -- Retention: 30 days telemetry, 90 days state history
 SELECT add_retention_policy('telemetry', INTERVAL '30 days');
 SELECT add_retention_policy('state_history', INTERVAL '90 days');
 
+-- 1-minute telemetry rollup for long history windows. Not
+-- materialized_only, so the latest minutes are aggregated from raw rows
+CREATE MATERIALIZED VIEW telemetry_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket('1 minute', time) AS bucket,
+    node_id,
+    avg(heap_free)::INTEGER AS heap_free,
+    max(uptime_sec) AS uptime_sec,
+    last(peer_count, time) AS peer_count,
+    last(role, time) AS role
+FROM telemetry
+GROUP BY bucket, node_id
+WITH NO DATA;
+CREATE INDEX idx_telemetry_1m_node_bucket ON telemetry_1m (node_id, bucket DESC);
+SELECT add_continuous_aggregate_policy('telemetry_1m',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute');
+SELECT add_retention_policy('telemetry_1m', INTERVAL '30 days');
+
 -- Firmware storage for OTA updates
 CREATE TABLE firmware (
     id SERIAL PRIMARY KEY,
@@ -65,7 +89,8 @@ CREATE TABLE firmware (
     filename VARCHAR(100) NOT NULL,
     size_bytes INTEGER NOT NULL,
     md5_hash VARCHAR(32) NOT NULL,
-    binary_data BYTEA NOT NULL,
+    num_parts INTEGER GENERATED ALWAYS AS ((size_bytes + 1023) / 1024) STORED,  -- OTA_PART_SIZE chunks
+    storage_path VARCHAR(255) NOT NULL,  -- Blob on disk, named <md5>-<upload id>.bin
     release_notes TEXT,
     is_stable BOOLEAN DEFAULT false,
     created_at TIMESTAMPTZ DEFAULT NOW(),
@@ -78,7 +103,7 @@ CREATE INDEX idx_firmware_type_version ON firmware(node_type, version DESC);
 CREATE TABLE ota_updates (
     id SERIAL PRIMARY KEY,
     firmware_id INTEGER REFERENCES firmware(id) ON DELETE CASCADE,
-    target_node_id VARCHAR(10),              -- NULL = all nodes of type
+    target_node_id BIGINT,                   -- NULL = all nodes of type
     target_node_type VARCHAR(30),
     status VARCHAR(20) DEFAULT 'pending',    -- pending/distributing/completed/failed
     force_update BOOLEAN DEFAULT false,
@@ -91,7 +116,7 @@ CREATE TABLE ota_updates (
 CREATE TABLE ota_node_status (
     id SERIAL PRIMARY KEY,
     update_id INTEGER REFERENCES ota_updates(id) ON DELETE CASCADE,
-    node_id VARCHAR(10) NOT NULL,
+    node_id BIGINT NOT NULL,
     status VARCHAR(20) DEFAULT 'pending',    -- pending/downloading/completed/failed
     current_part INTEGER DEFAULT 0,
     total_parts INTEGER,
@@ -101,5 +126,6 @@ CREATE TABLE ota_node_status (
     UNIQUE(update_id, node_id)
 );
 
-CREATE INDEX idx_ota_updates_status ON ota_updates(status);
-CREATE INDEX idx_ota_node_status_update ON ota_node_status(update_id);
+CREATE INDEX idx_ota_updates_status ON ota_updates(status, created_at);
+CREATE INDEX idx_ota_updates_pending ON ota_updates(created_at) WHERE status = 'pending';
+-- ota_node_status lookups by (update_id, node_id) use its UNIQUE index